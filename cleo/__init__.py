@@ -1,26 +1,24 @@
-import sys
 import os
-from pkgutil import extend_path
 from pathlib import Path
 
-# NOTE: 
-# This makes it posible to do `from cleo import x` instead of haveing to do the abselute path.
-# This is also called a namespace package.
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-__path__ = extend_path(__path__, __name__)
-
 # Usefull paths
 templates_dir: Path = Path(Path(__file__).parent, 'templates')
 project_root : Path = Path(Path(__file__).parent.parent)
 addons: Path = Path(project_root, 'commands')
+cache_dir: Path = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache', 'cleo')
 
-# DO the import last, so we aviod circular imports 
-from . import utils
-
-__version__ = utils.version.get_version()
-VERSION: str = __version__
 NAME = __name__
 
+def __getattr__(name: str):
+    """Compute ``VERSION``/``__version__`` the first time they are read."""
+    if name in ('VERSION', '__version__'):
+        from .utils.version import get_version
+        version = get_version()
+        globals()['VERSION'] = globals()['__version__'] = version
+        return version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# DO the import last, so we aviod circular imports 
 from . import config
 from . import cli
 
@@ -1,15 +1,29 @@
 # Standard library imports
+import os
+import pickle
+import sys
 from importlib import import_module
 from pathlib import Path
 
 # Third-party imports
 import rich
 import typer
+from typer.core import TyperGroup
 
 # Local imports
+from cleo import addons, cache_dir
 from cleo.config import configuration
 
-cli = typer.Typer(help="cleo CLI application")
+cli = typer.Typer(
+    help="cleo CLI application",
+    pretty_exceptions_enable=False,
+    pretty_exceptions_show_locals=False,
+)
+
+_CACHE_FILE = Path(cache_dir, 'discovery.pkl')
+
+# Directories that never contain command modules
+_SKIP_DIRS = frozenset({'__pycache__', 'node_modules', 'venv'})
 
 def discover_commands(commands_dir: Path):
     """Discover and register commands from CLI directories"""
@@ -18,72 +32,222 @@ def discover_commands(commands_dir: Path):
         return
     
     module_apps = {}
+
+    entries = _load_cache(commands_dir)
+    if entries is not None:
+        # Nothing changed since the last run, skip the directory walk and only
+        # import the module of the command that is actually invoked
+        lazy_commands = {}
+        for import_path, module_name, parent_module, cmd_name, help in entries:
+            lazy_commands.setdefault(parent_module, {})[cmd_name] = (import_path, help)
+            if configuration.debug:
+                rich.print(f"[green]Registered lazy command: {parent_module or ''} {cmd_name}[/green]")
+
+        cli.info.cls = _lazy_group(lazy_commands.pop(None, {}))
+        for parent_module, commands in lazy_commands.items():
+            _get_parent_app(parent_module, module_apps, cls=_lazy_group(commands))
+    else:
+        seen = []
+        entries = _scan_commands(commands_dir, seen, module_apps)
+        _write_cache(commands_dir, seen, entries)
     
-    # Scan for Python files in commands directory structure
-    for item in commands_dir.rglob("*.py"):
-        if item.name == '__init__.py':
-            continue
-            
-        relative_path = item.relative_to(commands_dir)
-        parts = relative_path.parts
-        
+    # Add all module apps to the main CLI
+    for module_app in module_apps.values():
+        cli.add_typer(module_app)
+
+
+def _scan_commands(commands_dir: Path, seen: list, module_apps: dict) -> list:
+    """
+    Walk ``commands_dir``, importing and registering every module that exposes a typer ``app``.
+
+    Returns the ``(import_path, module_name, parent_module, cmd_name, help)`` entries of the
+    registered commands and records every visited directory and file in ``seen``.
+    """
+    entries = []
+    # Every entry path starts with the scanned root, so it can be sliced off
+    root_len = len(os.fspath(commands_dir)) + 1
+    for entry in _iter_py(commands_dir, seen):
+        import_path = entry.path
         try:
-            import_path = _build_import_path(commands_dir, item)
-            module_name = item.stem
-            module = import_module(import_path)
+            # Relative path parts without the .py suffix
+            parts = entry.path[root_len:-3].split(os.sep)
+            import_path = "commands." + ".".join(parts)
+            module = _import(import_path)
             
             if not (hasattr(module, 'app') and isinstance(module.app, typer.Typer)):
                 if configuration.debug:
                     rich.print(f"[yellow]Module {import_path} does not contain a typer app[/yellow]")
                 continue
-            
-            if len(parts) == 1:
-                # Direct file in commands directory - add directly to main CLI
-                cli.add_typer(module.app, name=module_name)
-                if configuration.debug:
-                    rich.print(f"[green]Registered top-level command: {module_name}[/green]")
-            else:
-                # File in subdirectory - group under parent module
-                parent_module = parts[0]
-                
-                if parent_module not in module_apps:
-                    module_apps[parent_module] = typer.Typer(
-                        name=parent_module, 
-                        help=f"Commands for {parent_module}"
-                    )
-                
-                _register_typer_app(module, module_name, parent_module, module_apps)
+
+            # Files in a subdirectory are grouped under their parent module
+            module_name = parts[-1]
+            parent_module = parts[0] if len(parts) > 1 else None
+            cmd_name = getattr(module, 'name', module_name) if parent_module else module_name
+            help = module.__doc__.strip() if parent_module and module.__doc__ else None
+            _register_typer_app(module.app, cmd_name, help, parent_module, module_apps)
+            entries.append((import_path, module_name, parent_module, cmd_name, help))
                 
         except ImportError as e:
             _log_error(f"Failed to import module {import_path}", e)
         except Exception as e:
-            _log_error(f"Error processing {item}", e)
-    
-    # Add all module apps to the main CLI
-    for module_app in module_apps.values():
-        cli.add_typer(module_app)
+            _log_error(f"Error processing {entry.path}", e)
+    return entries
 
 
-def _build_import_path(commands_dir: Path, item: Path) -> str:
-    """Build the correct import path for a module in the commands directory."""
-    relative_path = item.relative_to(commands_dir)
-    parts = list(relative_path.parts)
-    parts[-1] = parts[-1].replace('.py', '')
-    return "commands." + ".".join(parts)
+def _iter_py(root: Path, seen: list | None = None):
+    """
+    Yield a ``DirEntry`` for every command module below ``root``.
 
+    Uses ``os.scandir`` so file type checks reuse the information returned by
+    readdir instead of issuing a ``stat`` per entry. Hidden entries and the
+    directories in ``_SKIP_DIRS`` are skipped before any import is attempted.
 
-def _register_typer_app(module, module_name, parent_module, module_apps):
-    """Register a Typer app with its parent module."""
-    cmd_name = getattr(module, 'name', module_name)
-    module_apps[parent_module].add_typer(module.app, name=cmd_name)
-    
-    if hasattr(module, '__doc__') and module.__doc__:
-        module.app.info.help = module.__doc__.strip()
+    If ``seen`` is given, every directory and module visited is appended to it,
+    which is what the discovery cache is validated against.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        path = stack.pop()
+        if seen is not None:
+            seen.append(path)
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            # An unreadable directory only loses its own commands
+            _log_error(f"Failed to scan directory {path}", e)
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith('.') or entry.name in _SKIP_DIRS:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.py') and entry.name != '__init__.py':
+                    if seen is not None:
+                        seen.append(entry.path)
+                    yield entry
+
+
+def _import(import_path: str):
+    """Import a command module, reusing it if it was already imported."""
+    module = sys.modules.get(import_path)
+    if module is None:
+        module = import_module(import_path)
+    return module
+
+
+def _register_typer_app(app, cmd_name, help, parent_module, module_apps):
+    """Register a Typer app on the main CLI, or with its parent module."""
+    if help:
+        app.info.help = help
+
+    if parent_module is None:
+        # Direct file in commands directory - add directly to main CLI
+        cli.add_typer(app, name=cmd_name)
+        if configuration.debug:
+            rich.print(f"[green]Registered top-level command: {cmd_name}[/green]")
+        return
+
+    _get_parent_app(parent_module, module_apps).add_typer(app, name=cmd_name)
     
     if configuration.debug:
         rich.print(f"[green]Registered command: {parent_module} {cmd_name}[/green]")
 
 
+def _get_parent_app(parent_module, module_apps, cls=None) -> typer.Typer:
+    """Get or create the Typer app grouping the commands of ``parent_module``."""
+    if parent_module not in module_apps:
+        module_apps[parent_module] = typer.Typer(
+            name=parent_module, 
+            help=f"Commands for {parent_module}",
+            cls=cls,
+        )
+    return module_apps[parent_module]
+
+
+class _LazyGroup(TyperGroup):
+    """
+    Click group that imports command modules the first time they are looked up.
+
+    Use ``_lazy_group`` to create a subclass with ``lazy_commands`` filled in, as
+    typer instantiates the group class itself.
+    """
+    # Command name -> (import_path, help)
+    lazy_commands: dict = {}
+
+    def list_commands(self, ctx):
+        names = super().list_commands(ctx)
+        return names + [name for name in self.lazy_commands if name not in names]
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            import_path, help = self.lazy_commands[cmd_name]
+            try:
+                module = _import(import_path)
+            except ImportError as e:
+                _invalidate_cache()
+                _log_error(f"Failed to import module {import_path}", e)
+                return None
+
+            if help:
+                module.app.info.help = help
+            group = typer.main.get_group(module.app)
+            group.name = cmd_name
+            self.add_command(group)
+        return super().get_command(ctx, cmd_name)
+
+
+def _lazy_group(commands: dict) -> type:
+    """Create a ``_LazyGroup`` subclass serving ``commands``."""
+    return type('LazyGroup', (_LazyGroup,), {'lazy_commands': commands})
+
+
+def _load_cache(commands_dir: Path):
+    """
+    Return the cached discovery entries for ``commands_dir``.
+
+    Returns ``None`` when there is no cache, or when any directory or module
+    recorded in it has been modified, added or removed since it was written.
+    """
+    try:
+        with open(_CACHE_FILE, 'rb') as f:
+            data = pickle.load(f)
+        if data['commands_dir'] != os.fspath(commands_dir):
+            return None
+        for path, mtime in data['stamps'].items():
+            if os.stat(path).st_mtime_ns != mtime:
+                return None
+        return data['entries']
+    except Exception:
+        return None
+
+
+def _write_cache(commands_dir: Path, seen: list, entries: list):
+    """Persist the discovery entries, so the next run can skip the walk."""
+    try:
+        # Stat after the imports, which may have created __pycache__ directories
+        data = {
+            'commands_dir': os.fspath(commands_dir),
+            'stamps': {path: os.stat(path).st_mtime_ns for path in seen},
+            'entries': entries,
+        }
+        _CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = _CACHE_FILE.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tmp_file, _CACHE_FILE)
+    except OSError as e:
+        _log_error(f"Failed to write discovery cache {_CACHE_FILE}", e)
+
+
+def _invalidate_cache():
+    """Remove the discovery cache, forcing a full walk on the next run."""
+    try:
+        _CACHE_FILE.unlink()
+    except FileNotFoundError:
+        pass
+
+
 def _log_error(message: str, error: Exception):
     """Log an error message if debug is enabled."""
     if configuration.debug:
@@ -111,6 +275,5 @@ def get_config():
 
 def main():
     """Main entry point for the CLI"""
-    commands_dir = Path(__file__).parent.parent.parent / "commands"
-    discover_commands(commands_dir)
+    discover_commands(addons)
     cli()
\ No newline at end of file
@@ -1,24 +1,23 @@
 import shlex
-from invoke import run, UnexpectedExit
+import subprocess
 
-def restart(username, domain_name, service):
-    # Sanitize inputs
-    username = shlex.quote(username)
-    domain_name = shlex.quote(domain_name)
-    service = shlex.quote(service)
+def restart(username, domain_name, service, control_path=None):
+    # Reuse an existing ssh master connection, if we are given one
+    ssh_opts = ["-o", f"ControlPath={control_path}"] if control_path else []
 
-    # Construct safe SSH command
-    cmd = f"ssh {username}@{domain_name} 'sudo systemctl restart {service}'"
+    # Run ssh directly, without a local shell. The remote command is still
+    # parsed by the remote shell, so the service name is quoted for it
+    cmd = ["ssh", *ssh_opts, f"{username}@{domain_name}", f"sudo systemctl restart {shlex.quote(service)}"]
 
-    print(f"Executing restart: {cmd}")
+    print(f"Executing restart: {shlex.join(cmd)}")
     
     try:
-        result = run(cmd, hide=False, warn=True)
-        if result.ok:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        if result.returncode == 0:
             print(f"✅ Successfully restarted {service} on {domain_name}")
         else:
-            print(f"⚠️ Failed to restart {service}. Exit code: {result.exited}")
-    except UnexpectedExit as e:
-        print(f"❌ Command failed: {e.result.stderr}")
+            print(f"⚠️ Failed to restart {service}. Exit code: {result.returncode}")
+            if result.stderr:
+                print(f"❌ Command failed: {result.stderr.strip()}")
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
@@ -2,7 +2,6 @@ import sys
 import functools
 from typing import Callable, Any
 import os
-import rich
 
 def disable_traceback(func: Callable) -> Callable:
     """
@@ -10,18 +9,13 @@ def disable_traceback(func: Callable) -> Callable:
     """
     @functools.wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
+        # Only while the decorated command runs, not for every command in the process
+        tracebacklimit = getattr(sys, 'tracebacklimit', None)
+        typer_standard_traceback = os.environ.get('_TYPER_STANDARD_TRACEBACK')
         try:
             sys.tracebacklimit = 0
             os.environ['_TYPER_STANDARD_TRACEBACK'] = '1'
-            
-            # Create a plain console without color/markup
-            rich.console._console = rich.console.Console(
-                color_system=None, 
-                highlight=False,
-                markup=False,
-                emoji=False
-            )
-        
+
             # Execute the original function
             return func(*args, **kwargs)
             
@@ -29,4 +23,13 @@ def disable_traceback(func: Callable) -> Callable:
             # Print only the error message without traceback or rich formatting
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)    
+        finally:
+            if tracebacklimit is None:
+                del sys.tracebacklimit
+            else:
+                sys.tracebacklimit = tracebacklimit
+            if typer_standard_traceback is None:
+                os.environ.pop('_TYPER_STANDARD_TRACEBACK', None)
+            else:
+                os.environ['_TYPER_STANDARD_TRACEBACK'] = typer_standard_traceback
     return wrapper
\ No newline at end of file
@@ -1,3 +1,5 @@
+import functools
+import os
 from pathlib import Path
 from typing import Dict, Any, Optional, Union, List
 
@@ -7,22 +9,27 @@ from jinja2 import (
     Template, 
     TemplateError, 
     select_autoescape,
-    ChoiceLoader
+    ChoiceLoader,
+    FileSystemBytecodeCache
 )
 
-from cleo import addons,templates_dir
+from cleo import addons,templates_dir,cache_dir
 
 def _setup_jinja_environment():
     def discover_template_dirs() -> List[Path]:
         addon_template_dirs = []
         
-        if addons.exists() and addons.is_dir():
-            for addon_dir in addons.iterdir():
-                if addon_dir.is_dir():
+        try:
+            with os.scandir(addons) as it:
+                for addon_dir in it:
+                    if not addon_dir.is_dir(follow_symlinks=False):
+                        continue
                     # Check if this addon has a templates directory
-                    addon_templates_path = addon_dir / 'templates'
-                    if addon_templates_path.exists() and addon_templates_path.is_dir():
-                        addon_template_dirs.append(addon_templates_path)
+                    addon_templates_path = os.path.join(addon_dir.path, 'templates')
+                    if os.path.isdir(addon_templates_path):
+                        addon_template_dirs.append(Path(addon_templates_path))
+        except (FileNotFoundError, NotADirectoryError):
+            pass
         
         return addon_template_dirs
     
@@ -30,48 +37,81 @@ def _setup_jinja_environment():
 
     loaders = [FileSystemLoader(path.absolute()) for path in addons_temp]
 
+    # Keep compiled templates between runs, the templates do not change while the CLI runs
+    bytecode_dir = Path(cache_dir, 'jinja')
+    try:
+        bytecode_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_dir))
+    except OSError:
+        bytecode_cache = None
+
     env = Environment(
         loader=ChoiceLoader(loaders),
         autoescape=select_autoescape(),
         trim_blocks=True,
         lstrip_blocks=True,
-        keep_trailing_newline=True
+        keep_trailing_newline=True,
+        auto_reload=False,
+        cache_size=-1,
+        bytecode_cache=bytecode_cache
     )
     
     return env
 
-def render(template_name: str, context: Optional[Dict[str, Any]] = {}) -> str:
+def render(template_name: str, context: Optional[Dict[str, Any]] = None) -> str:
     """
     Render a template from the filesystem.
     """
     try:
-        template = _env.get_template(template_name)
-        return template.render(**context)
+        template = _get_template(template_name)
+        return template.render(context or {})
     except Exception as e:
         raise TemplateError(f"Failed to render template '{template_name}': {str(e)}") from e
 
-def render_from_string(template_str: str, context: Optional[Dict[str, Any]] = {}) -> str:
+def render_from_string(template_str: str, context: Optional[Dict[str, Any]] = None) -> str:
     """
     Render a template from a string.
     """
     try:
-        template = Environment().from_string(template_str)
-        return template.render(**context)
+        template = _get_string_template(template_str)
+        return template.render(context or {})
     except Exception as e:
         raise TemplateError(f"Failed to render template string: {str(e)}") from e
 
 def load_template(template_name: str) -> Template:
     try:
-        return _env.get_template(template_name)
+        return _get_template(template_name)
     except Exception as e:
         raise TemplateError(f"Failed to load template '{template_name}': {str(e)}") from e
 
+@functools.lru_cache(maxsize=None)
+def _get_template(template_name: str) -> Template:
+    return _get_env().get_template(template_name)
+
+@functools.lru_cache(maxsize=64)
+def _get_string_template(template_str: str) -> Template:
+    return _string_env.from_string(template_str)
+
 def get_environment() -> Environment:
-    return _env
+    return _get_env()
 
 def set_environment(environment : Environment) -> Environment:
     global _env
     _env = environment
+    _get_template.cache_clear()
+    return _env
+
+def _get_env() -> Environment:
+    """
+    Return the shared environment, creating it on first use.
+
+    Setting up the environment scans the addons for template directories, so it
+    is deferred until a template is actually needed.
+    """
+    global _env
+    if _env is None:
+        _env = _setup_jinja_environment()
     return _env
 
-_env = _setup_jinja_environment()
+_env: Optional[Environment] = None
+_string_env = Environment()
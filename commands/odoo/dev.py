@@ -1,20 +1,210 @@
 
-import base64
 import os
+import re
+import shlex
+import shutil
+import tempfile
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Annotated
 
 import invoke
 import typer
+from jinja2 import Template
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from cleo.config import configuration
 from cleo.utils.decorators.exception import disable_traceback
-from cleo import utils
 from cleo.libs.server.server import restart as service_restart
 
 app = typer.Typer(help="A set of commands to interact with Moduels on a given instance")
 console = Console()
 
+# Upper bound on concurrent scp transfers during deploy
+_MAX_TRANSFERS = 8
+
+# Servers deploy may target without --force: a "test", "dev" or "upgrade" part in the first
+# label of the hostname, optionally numbered (dev2.example.com, erp-test-01.example.com).
+# Overridable with the "safe_server_pattern" config key, which is matched against that label only
+_SAFE_SERVER_PATTERN = r"(?:^|[-_])(?:test|dev|upgrade)-?\d*(?:[-_]|$)"
+
+
+def _is_safe_server(server: str) -> bool:
+    """Check whether deploy may target ``server`` without --force."""
+    # Compiled here rather than at import, so a bad pattern is reported instead of
+    # making command discovery skip this module
+    pattern = configuration.loaded_config.get("safe_server_pattern", _SAFE_SERVER_PATTERN)
+    try:
+        safe_server_re = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid safe_server_pattern {pattern!r} in config: {e}") from e
+    return safe_server_re.search(server.split(".", 1)[0]) is not None
+
+
+def _has_manifest(path: str) -> bool:
+    """Check whether ``path`` is an Odoo module, using a single stat call."""
+    try:
+        os.stat(os.path.join(path, "__manifest__.py"))
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    return True
+
+
+def _iter_modules(root: str):
+    """Yield the path of every Odoo module directly inside ``root``."""
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir() and _has_manifest(entry.path):
+                yield entry.path
+
+
+def _open_ssh_master(user: str, server: str, hide: bool = False) -> str:
+    """
+    Start a background ssh master connection to ``server``, and return its control path.
+
+    Pass ``-o ControlPath=<path>`` to ssh/scp to multiplex over it. The master
+    exits by itself once it has been idle for a minute.
+    """
+    # The socket lives in a private directory, so other local users cannot claim its path first
+    control_dir = tempfile.mkdtemp(prefix="cleo-ssh-")
+    control_path = os.path.join(control_dir, "master.sock")
+    try:
+        invoke.run(
+            command=f"ssh -M -N -f -o ControlPath={control_path} -o ControlPersist=60s {user}@{server}",
+            hide=hide,
+        )
+    except BaseException:
+        shutil.rmtree(control_dir, ignore_errors=True)
+        raise
+    return control_path
+
+
+def _close_ssh_master(user: str, server: str, control_path: str) -> None:
+    """Stop the ssh master connection started by ``_open_ssh_master``, and remove its socket directory."""
+    try:
+        invoke.run(command=f"ssh -O exit -o ControlPath={control_path} {user}@{server}", hide=True, warn=True)
+    finally:
+        shutil.rmtree(os.path.dirname(control_path), ignore_errors=True)
+
+
+# Odoo shell script installing/upgrading multiple modules, compiled once
+_ODOO_BIN_SHELL_TEMPLATE = Template("""
+import importlib
+import sys
+import os
+# Add the custom directory to the Python path
+custom_path = os.path.expanduser("{{ remote_path }}")
+if custom_path not in sys.path:
+    sys.path.insert(0, custom_path)
+
+# Update module list first
+env['ir.module.module'].update_list()
+
+# Process each module
+module_names = {{ module_names }}
+for module_name in module_names:
+    print(f"Processing module: {module_name}")
+    module = env['ir.module.module'].search([('name', '=', module_name)], limit=1)
+    if module:
+        if module.state == 'installed':
+            print(f"Module {module_name} is already installed. Upgrading...")
+            module.button_immediate_upgrade()
+        else:
+            print(f"Installing module {module_name}...")
+            module.button_immediate_install()
+        print(f"Module {module_name} has been successfully {'upgraded' if module.state == 'installed' else 'installed'}")
+    else:
+        print(f"Module {module_name} not found. Please check the module name.")
+    print("-" * 50)
+
+env.cr.commit()
+print(f"All modules processed successfully!")
+""")
+
+
+# Seconds to wait for the XML-RPC login before falling back to the odoo-bin shell
+_RPC_LOGIN_TIMEOUT = 10
+
+
+class _TimeoutTransport(xmlrpc.client.SafeTransport):
+    """HTTPS transport giving up on a server that does not answer within ``timeout`` seconds."""
+
+    def __init__(self, timeout: float, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+def _install_modules_rpc(server: str, database: str, login: str, password: str, module_names: list[str]) -> bool:
+    """
+    Install/upgrade modules with XML-RPC calls to the Odoo instance on ``server``.
+
+    Every installed module is upgraded in one ``button_immediate_upgrade`` call,
+    so the registry is only reloaded once. Returns False if the instance could
+    not be reached or the login failed, so the caller can fall back to the shell.
+    """
+    try:
+        # A filtered port or a restarting instance must not hold up the fallback
+        common = xmlrpc.client.ServerProxy(
+            f"https://{server}/xmlrpc/2/common",
+            transport=_TimeoutTransport(_RPC_LOGIN_TIMEOUT),
+            allow_none=True,
+        )
+        uid = common.authenticate(database, login, password, {})
+        if not uid:
+            console.print(f"[yellow]XML-RPC login failed for {login}, falling back to odoo-bin shell[/yellow]")
+            return False
+
+        models = xmlrpc.client.ServerProxy(f"https://{server}/xmlrpc/2/object", allow_none=True)
+
+        def execute(method, *args):
+            return models.execute_kw(database, uid, password, "ir.module.module", method, list(args))
+
+        execute("update_list")
+        found = execute("search_read", [("name", "in", module_names)], ["name", "state"])
+    except (OSError, xmlrpc.client.Error) as e:
+        console.print(f"[yellow]XML-RPC unavailable ({e}), falling back to odoo-bin shell[/yellow]")
+        return False
+
+    for module_name in set(module_names) - {module["name"] for module in found}:
+        console.print(f"[red]Module {module_name} not found. Please check the module name.[/red]")
+
+    to_upgrade = [module["id"] for module in found if module["state"] == "installed"]
+    to_install = [module["id"] for module in found if module["state"] != "installed"]
+    if to_upgrade:
+        execute("button_immediate_upgrade", to_upgrade)
+    if to_install:
+        execute("button_immediate_install", to_install)
+    return True
+
+
+def _install_modules_shell(user: str, server: str, database: str, remote: str, module_names: list[str], ssh_opts: str = "") -> None:
+    """Install/upgrade modules by piping a script into ``odoo-bin shell`` on ``server``."""
+    process_code = _ODOO_BIN_SHELL_TEMPLATE.render(module_names=module_names, remote_path=remote)
+
+    # The script is fed to the remote odoo-bin through the stdin of ssh, rather
+    # than squeezing it into the command line
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(process_code)
+        script_path = f.name
+
+    try:
+        # Execute the installation command
+        cmd = (
+            f'ssh {ssh_opts} {user}@{server} "source bin/activate && '
+            f'src/odoo/odoo-bin shell -c .config/odoo/odoo.conf -d {database} --no-http  --log-level=warn" '
+            f"< {shlex.quote(script_path)}"
+        )
+        invoke.run(command=cmd, in_stream=False)
+    finally:
+        os.unlink(script_path)
+
+
 @app.command(help="Deploy one or more odoo modules to a given instance")
 @disable_traceback
 def deploy(
@@ -25,9 +215,11 @@ def deploy(
     modules: Annotated[str, typer.Argument(help="Module path(s) or 'all' to deploy all modules in current directory")] = None,
     verbose: Annotated[bool, typer.Option()] = False,
     force: Annotated[bool, typer.Option(hidden=True)] = False,
+    login: Annotated[str, typer.Option(help="Odoo login used to install/update modules over XML-RPC, defaults to --user")] = "",
+    password: Annotated[str, typer.Option(help="Odoo password, enables installing/updating modules over XML-RPC", envvar="ODOO_PASSWORD")] = "",
 ) -> None:
 
-    if not any(keyword in server for keyword in ["test", "dev", "dev2", "upgrade"]) and force == False:
+    if not force and not _is_safe_server(server):
         raise ValueError("Nope, not allowed")
 
     if not database:
@@ -37,11 +229,7 @@ def deploy(
     module_paths = []
     if modules.lower() == "all":
         # Find all directories in current directory that contain __manifest__.py
-        current_dir = os.getcwd()
-        for item in os.listdir(current_dir):
-            item_path = os.path.join(current_dir, item)
-            if os.path.isdir(item_path) and os.path.exists(os.path.join(item_path, "__manifest__.py")):
-                module_paths.append(item_path)
+        module_paths = list(_iter_modules(os.getcwd()))
         
         if not module_paths:
             console.print("[red]No Odoo modules found in current directory[/red]")
@@ -56,94 +244,85 @@ def deploy(
         
         # Validate all paths exist
         for path in module_paths:
+            if _has_manifest(path):
+                continue
             if not os.path.exists(path):
                 console.print(f"[red]Module path does not exist: {path}[/red]")
-                return
-            if not os.path.exists(os.path.join(path, "__manifest__.py")):
+            else:
                 console.print(f"[red]Not a valid Odoo module (no __manifest__.py): {path}[/red]")
-                return
-
-    with Progress(
-        SpinnerColumn(), TextColumn("[blue]{task.description}"), transient=True
-    ) as progress:
-        for module_path in module_paths:
-            module_name = os.path.basename(module_path)
-            transfer_task = progress.add_task(
-                description=f"[blue]Transferring module {module_name} to {server}..."
-            )
+            return
 
-            # Create directory on remote server
-            mkdir_cmd = f'ssh {user}@{server} "mkdir -p {remote}/{module_name}"'
-            invoke.run(command=mkdir_cmd, hide=verbose)
+    # Deploy every module once, even if it was given twice or through different paths
+    unique_paths = {}
+    for path in module_paths:
+        real_path = os.path.realpath(path)
+        if real_path not in unique_paths:
+            unique_paths[real_path] = path
+        elif unique_paths[real_path] != path:
+            console.print(f"[yellow]Skipping {path}, it is the same module as {unique_paths[real_path]}[/yellow]")
 
-            # Copy module files
-            scp_cmd = f"scp -r {module_path}/* {user}@{server}:{remote}/{module_name}/"
-            invoke.run(command=scp_cmd, hide=verbose)
+    # Most recently changed modules first
+    module_paths = sorted(unique_paths.values(), key=os.path.getmtime, reverse=True)
 
-            progress.update(transfer_task, completed=True)
+    # Every ssh/scp call below reuses this connection instead of doing its own handshake
+    control_path = _open_ssh_master(user, server, hide=verbose)
+    ssh_opts = f"-o ControlPath={control_path}"
+    try:
+        # Everything derived from a module path, computed once per module
+        deploy_modules = []
+        for module_path in module_paths:
+            module_name = os.path.basename(module_path)
+            remote_dir = f"{remote}/{module_name}"
+            deploy_modules.append({
+                "name": module_name,
+                "remote_dir": remote_dir,
+                "scp": f"scp {ssh_opts} -r {module_path}/* {user}@{server}:{remote_dir}/",
+            })
+        module_names = [module["name"] for module in deploy_modules]
 
-    console.print(
-        f"[bold blue]:heavy_check_mark:  All modules transferred successfully![/bold blue]"
-    )
+        # Create all module directories on remote server in one go
+        remote_dirs = " ".join(module["remote_dir"] for module in deploy_modules)
+        mkdir_cmd = f'ssh {ssh_opts} {user}@{server} "mkdir -p {remote_dirs}"'
+        invoke.run(command=mkdir_cmd, hide=verbose)
 
-    # Restart instance
-    service_restart(username=user, domain_name=server, service=f"{database}.service")
+        # A single live display for all phases of the deploy
+        with Progress(
+            SpinnerColumn(), TextColumn("[blue]{task.description}"), transient=True, refresh_per_second=4
+        ) as progress:
+            # Modules are copied concurrently, the pool is kept small to stay below sshd's MaxStartups
+            with ThreadPoolExecutor(max_workers=min(_MAX_TRANSFERS, len(deploy_modules))) as executor:
+                transfers = {}
+                for module in deploy_modules:
+                    transfer_task = progress.add_task(
+                        description=f"[blue]Transferring module {module['name']} to {server}..."
+                    )
+                    # Copy module files. The transfers run concurrently, so none of them may
+                    # take over the terminal's stdin
+                    transfers[executor.submit(invoke.run, command=module["scp"], hide=verbose, in_stream=False)] = transfer_task
 
-    # Install/update all modules
-    module_names = [os.path.basename(path) for path in module_paths]
-    
-    # Create the Odoo shell script for multiple modules
-    odoo_bin_shell_template = """
-import importlib
-import sys
-import os
-# Add the custom directory to the Python path
-custom_path = os.path.expanduser("{{ remote_path }}")
-if custom_path not in sys.path:
-    sys.path.insert(0, custom_path)
+                for future in as_completed(transfers):
+                    future.result()
+                    progress.remove_task(transfers[future])
 
-# Update module list first
-env['ir.module.module'].update_list()
+            console.print(
+                f"[bold blue]:heavy_check_mark:  All modules transferred successfully![/bold blue]"
+            )
 
-# Process each module
-module_names = {{ module_names }}
-for module_name in module_names:
-    print(f"Processing module: {module_name}")
-    module = env['ir.module.module'].search([('name', '=', module_name)], limit=1)
-    if module:
-        if module.state == 'installed':
-            print(f"Module {module_name} is already installed. Upgrading...")
-            module.button_immediate_upgrade()
-        else:
-            print(f"Installing module {module_name}...")
-            module.button_immediate_install()
-        print(f"Module {module_name} has been successfully {'upgraded' if module.state == 'installed' else 'installed'}")
-    else:
-        print(f"Module {module_name} not found. Please check the module name.")
-    print("-" * 50)
+            # Restart instance
+            restarting = progress.add_task(f"[blue] Restarting {database}.service...")
+            service_restart(username=user, domain_name=server, service=f"{database}.service", control_path=control_path)
+            progress.remove_task(restarting)
 
-env.cr.commit()
-print(f"All modules processed successfully!")
-"""
-    
-    process_code = utils.templates.render_from_string(
-        template_str=odoo_bin_shell_template,
-        context={"module_names": module_names, "remote_path": remote},
-    )
-    process_code_b64 = base64.b64encode(process_code.encode()).decode()
+            installing = progress.add_task(f"[blue] Installing/updating modules...")
+            # A single RPC round trip is much cheaper than booting an odoo-bin shell,
+            # but needs credentials and a reachable RPC endpoint
+            if not (password and _install_modules_rpc(server, database, login or user, password, module_names)):
+                _install_modules_shell(user, server, database, remote, module_names, ssh_opts)
+            progress.remove_task(installing)
+    finally:
+        # Also when a transfer, the restart or the install failed, so no socket is left behind
+        _close_ssh_master(user, server, control_path)
 
-    with Progress(
-        SpinnerColumn(), TextColumn("[blue]{task.description}"), transient=True
-    ) as progress:
-        # Execute the installation command
-        cmd = (
-            f'ssh {user}@{server} "source bin/activate && '
-            f"echo '{process_code_b64}' | base64 -d | "
-            f'src/odoo/odoo-bin shell -c .config/odoo/odoo.conf -d {database} --no-http  --log-level=warn"'
-        )
-        installing = progress.add_task(f"[blue] Installing/updating modules...")
-        invoke.run(command=cmd)
-        progress.update(installing, completed=True)
     console.print(
         f"[bold blue]:heavy_check_mark:  Installed/updated successfully![/bold blue]"
     )
@@ -1,18 +1,132 @@
+import functools
+import os
+import pprint
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Annotated
 import rich
 import typer
-from lxml import etree
 
 from cleo.utils.jinja import render
 
+# Upper bound on threads writing scaffolded files
+_MAX_WRITERS = 8
+
+# Templates the scaffolded files are rendered from
+_TPL_INIT = "skel/module/__init__.py.jinja"
+_TPL_CONTROLLERS_INIT = "skel/module/controllers/__init__.py.jinja"
+_TPL_CONTROLLER = "skel/module/controllers/module.py.jinja"
+_TPL_DATA = "skel/module/data/model_data.xml.jinja"
+_TPL_MODELS_INIT = "skel/module/models/__init__.py.jinja"
+_TPL_MODEL = "skel/module/models/model.py.jinja"
+_TPL_REPORT_INIT = "skel/module/report/__init__.py.jinja"
+_TPL_ACCESS = "skel/module/security/ir.model.access.csv.jinja"
+_TPL_ACCESS_ROWS = "skel/module/security/_partial/model_rows.csv.jinja"
+_TPL_VIEWS = "skel/module/views/model_views.xml.jinja"
+_TPL_VIEWS_BUNDLE = "skel/module/views/_partial/views_bundle.xml.jinja"
+_TPL_WIZARD_INIT = "skel/module/wizard/__init__.py.jinja"
+
+# Written above the manifest dict, which is pretty printed rather than rendered
+_MANIFEST_HEADER = "# -*- coding: utf-8 -*-\n"
+
+# The optional parts of a module: the flag selecting it, its directory and the
+# files scaffolded in it as (file name, template) pairs. File names are formatted
+# with the module name
+_MODULE_PARTS = (
+    ("controllers", "controllers", (
+        ("__init__.py", _TPL_CONTROLLERS_INIT),
+        ("{name}.py", _TPL_CONTROLLER),
+    )),
+    ("data", "data", ()),
+    ("models", "models", (
+        ("__init__.py", _TPL_MODELS_INIT),
+    )),
+    ("reports", "report", (
+        ("__init__.py", _TPL_REPORT_INIT),
+    )),
+    ("security", "security", (
+        ("ir.model.access.csv", _TPL_ACCESS),
+    )),
+    ("static", os.path.join("static", "src"), ()),
+    ("static", os.path.join("static", "description"), ()),
+    ("views", "views", ()),
+    ("wizards", "wizard", (
+        ("__init__.py", _TPL_WIZARD_INIT),
+    )),
+)
+
+
 
 def _write_template_file(file_path: Path, template_name: str, context: dict = None):
     """Helper function to write a template file"""
-    if context is None:
-        context = {}
-    with file_path.open("w") as f:
-        f.write(render(template_name=template_name, context=context))
+    file_path.write_bytes(render(template_name=template_name, context=context).encode("utf-8"))
+
+
+def _queue_template_file(pending: list, file_path: str, template_name: str, context: dict = None):
+    """Helper function to render a template file, to be written later by _write_files"""
+    pending.append((file_path, render(template_name=template_name, context=context)))
+
+
+def _write_files(pending: list):
+    """Helper function to write all the queued files in one go"""
+    # Encode up front, so the worker threads only do the I/O
+    files = [(file_path, data.encode("utf-8")) for file_path, data in pending]
+    if len(files) <= 2:
+        # Not worth starting a pool for
+        for file_path, data in files:
+            _write_bytes(file_path, data)
+        return
+
+    # The files are independent and writing releases the GIL, so overlap the writes
+    with ThreadPoolExecutor(max_workers=min(_MAX_WRITERS, len(files))) as executor:
+        list(executor.map(lambda file: _write_bytes(*file), files))
+
+
+def _write_bytes(file_path: str, data: bytes):
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _views_xml_tools():
+    """
+    Return the parser and the compiled XPath used to update view files with lxml.
+
+    Built on first use, so lxml is only imported when a view file actually has to be parsed.
+    The XPath finds the element holding the records, stopping at the first record.
+    """
+    from lxml import etree
+    return (
+        etree.XMLParser(remove_blank_text=False),
+        etree.XPath("(//record)[1]/parent::*"),
+    )
+
+
+def _find_views_insert_offset(content: bytes) -> int | None:
+    """
+    Find where new records go in a views file: after the last element inside the
+    closing </data> tag wrapping the records, or inside </odoo> when there is no <data>.
+
+    Returns None when the records cannot be spliced in as bytes: the file does not end
+    with an <odoo> root element, or the last <data> element has attributes (fx. noupdate)
+    and is not the one holding the first record.
+    """
+    end = content.rfind(b"</odoo>")
+    if end == -1:
+        return None
+    head = content[:end].rstrip()
+    if head.endswith(b"</data>"):
+        head = head[:-len(b"</data>")].rstrip()
+        start = content.rfind(b"<data", 0, len(head))
+        if start == -1:
+            return None
+        attributes = content[start + len(b"<data"):content.find(b">", start)].strip()
+        if attributes and not start < content.find(b"<record"):
+            return None
+    elif b"<data" in content:
+        # The last element is not the <data> wrapping the records
+        return None
+    return len(head)
 
 
 app = typer.Typer(
@@ -88,17 +202,22 @@ def module(
     If you wish to generate a more fitting manifest file, please use odooctl make manifest, afterwards
     """
     depends: list[str] = depends.split(",")
+    flags = {
+        "controllers": controllers,
+        "data": data,
+        "models": models,
+        "static": static,
+        "reports": reports,
+        "views": views,
+        "wizards": wizards,
+    }
     if all:
-        controllers = True
-        data = True
-        models = True
-        static = True
-        reports = True
-        views = True
-        wizards = True
+        flags = dict.fromkeys(flags, True)
+    # Models, reports and wizards all need access rules
+    flags["security"] = flags["models"] or flags["reports"] or flags["wizards"]
 
-    root = Path(Path.cwd(), name)
-    root.mkdir(parents=True)
+    root = os.path.join(os.getcwd(), name)
+    os.makedirs(root)
 
     # Construct our manifest
     manifest = {
@@ -110,86 +229,45 @@ def module(
         "summary": """""",
         "category": "Uncategorized",
         "description": """""",
-        "data": [],
+        "data": ["security/ir.model.access.csv"] if flags["security"] else [],
         "demo": [],
         "installable": True,
         "auto_install": False,
         "application": app,
     }
 
-    _write_template_file(
-        Path(root, "__manifest__.py"),
-        "skel/module/__manifest__.py.jinja",
-        {"manifest": manifest}
+    # Rendered files are collected here and written in one pass at the end,
+    # after the directories in subdirs have been created
+    pending: list[tuple[str, str]] = []
+    subdirs: set[str] = set()
+
+    pending.append((
+        os.path.join(root, "__manifest__.py"),
+        _MANIFEST_HEADER + pprint.pformat(manifest, sort_dicts=False, width=100) + "\n"
+    ))
+    _queue_template_file(
+        pending,
+        os.path.join(root, "__init__.py"),
+        _TPL_INIT,
+        flags
     )
-    _write_template_file(
-        Path(root, "__init__.py"),
-        "skel/module/__init__.py.jinja",
-        {
-            "controllers": controllers,
-            "data": data,
-            "models": models,
-            "static": static,
-            "reports": reports,
-            "views": views,
-            "wizards": wizards,
-        }
-    )
-    if controllers:
-        controllers_dir = Path(root, "controllers")
-        controllers_dir.mkdir()
-        _write_template_file(
-            controllers_dir / "__init__.py",
-            "skel/module/controllers/__init__.py.jinja",
-            {"name": name}
-        )
-        _write_template_file(
-            controllers_dir / f"{name}.py",
-            "skel/module/controllers/module.py.jinja",
-            {"name": name}
-        )
-    if data:
-        Path(root, "data").mkdir()
-
-    if models:
-        models_dir = Path(root, "models")
-        models_dir.mkdir()
-        _write_template_file(
-            models_dir / "__init__.py",
-            "skel/module/models/__init__.py.jinja"
-        )
-    if reports:
-        reports_dir = Path(root, "report")
-        reports_dir.mkdir()
-        _write_template_file(
-            reports_dir / "__init__.py",
-            "skel/module/report/__init__.py.jinja"
-        )
-
-    if any([models, reports, wizards]):
-        manifest["data"].append("security/ir.model.access.csv")
-        security_dir = Path(root, "security")
-        security_dir.mkdir()
-        _write_template_file(
-            security_dir / "ir.model.access.csv",
-            "skel/module/security/ir.model.access.csv.jinja"
-        )
-
-    if static:
-        Path(root, "static").mkdir()
-        Path(root, "static", "src").mkdir()
-        Path(root, "static", "description").mkdir()
-
-    if views:
-        Path(root, "views").mkdir()
+    for flag, subdir, files in _MODULE_PARTS:
+        if not flags[flag]:
+            continue
+        subdir_path = os.path.join(root, subdir)
+        subdirs.add(subdir_path)
+        for file_name, template_name in files:
+            _queue_template_file(
+                pending,
+                os.path.join(subdir_path, file_name.format(name=name)),
+                template_name,
+                {"name": name}
+            )
 
-    if wizards:
-        wizard_dir = Path(root, "wizard")
-        wizard_dir.mkdir()
-        _write_template_file(
-            wizard_dir / "__init__.py",
-            "skel/module/wizard/__init__.py.jinja"
-        )
+    # Parents first, makedirs creates any missing intermediate directory anyway
+    for subdir in sorted(subdirs, key=lambda path: path.count(os.sep)):
+        os.makedirs(subdir, exist_ok=True)
+    _write_files(pending)
 
     rich.print(
         f"[bold green]The module, {name}, has been scaffolded. Happy developing :)[/bold green]"
@@ -221,11 +299,11 @@ def controller(
     controllers_dir.mkdir(exist_ok=True)
     _write_template_file(
         controllers_dir / f"{name}.py",
-        "skel/module/controllers/module.py.jinja",
+        _TPL_CONTROLLER,
         {"name": name}
     )
-    with Path(module, "controllers", "__init__.py").open("a") as f:
-        f.write(f"from . import {name}")
+    with Path(module, "controllers", "__init__.py").open("ab") as f:
+        f.write(f"from . import {name}".encode("utf-8"))
 
     rich.print(
         f"[bold green]The controller, {name}, has been scaffolded in module {module}. Happy developing :)[/bold green]"
@@ -252,7 +330,7 @@ def data(
     data_dir.mkdir(exist_ok=True)
     _write_template_file(
         data_dir / f'{model.replace(".", "_")}_data.xml',
-        "skel/module/data/model_data.xml.jinja",
+        _TPL_DATA,
         {"model": model}
     )
 
@@ -269,10 +347,10 @@ def model(
             help="A path to the module in which we want to scaffold the model"
         ),
     ],
-    name: Annotated[
-        str,
+    names: Annotated[
+        list[str],
         typer.Argument(
-            help='Should be the technical name of the model eg. "sale.order"'
+            help='Should be the technical names of the models eg. "sale.order"'
         ),
     ],
     transient: Annotated[
@@ -294,36 +372,37 @@ def model(
         ),
     ] = "",
 ) -> None:
-    """Scaffolds a new Odoo model in module provided, inside a subfolder called "models"
+    """Scaffolds new Odoo models in module provided, inside a subfolder called "models"
 
-    This process will also update an models/__init__.py file with your new model.
-    This process will also update the security/ir.model.access.csv file with a basic ruleset for your new model.
+    This process will also update an models/__init__.py file with your new models.
+    This process will also update the security/ir.model.access.csv file with a basic ruleset for your new models.
     """
     if implements:
         implements: list[str] = implements.split(",")
 
     models_dir = Path(module, "models")
     models_dir.mkdir(exist_ok=True)
-    _write_template_file(
-        models_dir / f"{name}.py",
-        "skel/module/models/model.py.jinja",
-        {
-            "name": name,
-            "parent": parent or False,
-            "implements": implements or [],
-            "transient": transient,
-        }
-    )
-    with Path(module, "models", "__init__.py").open("a") as f:
-        f.write(f'\nfrom . import {name.replace(".", "_")}')
+    for name in names:
+        _write_template_file(
+            models_dir / f"{name}.py",
+            _TPL_MODEL,
+            {
+                "name": name,
+                "parent": parent or False,
+                "implements": implements or [],
+                "transient": transient,
+            }
+        )
+    with Path(module, "models", "__init__.py").open("ab") as f:
+        f.write("".join(f'\nfrom . import {name.replace(".", "_")}' for name in names).encode("utf-8"))
 
-    # TODO: Implement a Jinja2 partial that we can call here instead. It will be better for reusability
-    with Path(module, "security", "ir.model.access.csv").open("a") as f:
+    # The access rules of all the models are rendered in one go
+    with Path(module, "security", "ir.model.access.csv").open("ab") as f:
         f.write(
             render(
-                template_name="skel/module/security/_partial/model.csv.jinja",
+                template_name=_TPL_ACCESS_ROWS,
                 context={
-                    "model": name,
+                    "models": names,
                     "name": module.name,
                     "group": False,
                     "read": int(True),
@@ -331,11 +410,11 @@ def model(
                     "create": int(True),
                     "unlink": int(True),
                 },
-            )
+            ).encode("utf-8")
         )
 
     rich.print(
-        f"[bold green]The model, {name}, has been scaffolded in module {module}. Happy developing :)[/bold green]"
+        f"[bold green]The models, {', '.join(names)}, have been scaffolded in module {module}. Happy developing :)[/bold green]"
     )
 
 
@@ -365,8 +444,9 @@ def view(
 ) -> None:
     """Scaffolds a new set of views in module provided, inside a subfolder called "views"
 
-    This process will update an existing file, if it exists, by appending the new views to the end of the file.
-    For this to work the view file must have at least one <record> element
+    This process will update an existing file, if it exists, by appending the new views to its last <data> element,
+    or to <odoo> when it has none. If that <data> element has attributes, such as noupdate, and the existing records
+    live elsewhere, the new views are appended next to the first <record> element instead, so the file must have one
     """
     view_file = Path(
         module, "views", f'{model.replace(".", "_")}_views.xml'
@@ -377,73 +457,65 @@ def view(
         search = True
     if view_file.exists():
         # When we have an existing set of views, we need to generate the requested partial views
-        # and append them to the file using lxml
-        views = etree.parse(view_file)
-        records = views.xpath("//record")
-        if not records:
-            rich.print(
-                "[bold red]Malformed view file! Cannot help you update this. Aborting...[/bold red]"
-            )
-            typer.Exit(code=100)
-        data_element = records[0].getparent()
-        if form:
-            data_element.append(
-                etree.XML(
-                    render(
-                        template_name="skel/module/views/_partial/form.xml.jinja",
-                        context={
-                            "module": module.name,
-                            "model": model,
-                        },
-                    )
-                )
-            )
-        if list:
-            data_element.append(
-                etree.XML(
-                    render(
-                        template_name="skel/module/views/_partial/tree.xml.jinja",
-                        context={
-                            "module": module.name,
-                            "model": model,
-                        },
-                    )
-                )
-            )
-        if search:
-            data_element.append(
-                etree.XML(
-                    render(
-                        template_name="skel/module/views/_partial/search.xml.jinja",
-                        context={
-                            "module": module.name,
-                            "model": model,
-                        },
-                    )
+        # and append them to the file. Find out where they go first, so nothing is rendered for
+        # a file we cannot update
+        original = view_file.read_bytes()
+        offset = _find_views_insert_offset(original)
+        if offset is None:
+            # Unusual layout, the partials are appended to the parent of the records using lxml
+            from lxml import etree
+
+            xml_parser, first_record_parent = _views_xml_tools()
+            views = etree.fromstring(original, xml_parser).getroottree()
+            parents = first_record_parent(views)
+            if not parents:
+                rich.print(
+                    "[bold red]Malformed view file! Cannot help you update this. Aborting...[/bold red]"
                 )
+                raise typer.Exit(code=100)
+
+        # The partials are rendered together, wrapped in a <fragments> element
+        bundle = render(
+            template_name=_TPL_VIEWS_BUNDLE,
+            context={
+                "module": module.name,
+                "model": model,
+                "form": form,
+                "list": list,
+                "search": search,
+            },
+        ).strip()
+        # Addons can override the template, so check its output before touching the file
+        if not (bundle.startswith("<fragments>") and bundle.endswith("</fragments>")):
+            rich.print(
+                f"[bold red]Malformed {_TPL_VIEWS_BUNDLE} template! It must wrap the views in a <fragments> element. Aborting...[/bold red]"
             )
+            raise typer.Exit(code=100)
 
-        # Finally output the data as a string that we can write
-        with view_file.open("w") as f:
-            xml_data = etree.tostring(
-                views, encoding="UTF-8", xml_declaration=True, pretty_print=True
-            )
-            f.write(xml_data)
+        if offset is not None:
+            # Splice the partials in front of the closing tag, so the rest of the file is
+            # neither parsed nor re-serialized
+            fragment = bundle.removeprefix("<fragments>").removesuffix("</fragments>").rstrip().encode("utf-8")
+            view_file.write_bytes(original[:offset] + fragment + original[offset:])
+        else:
+            parents[0].extend(etree.fromstring(bundle))
+
+            # Finally serialize the tree straight into the file
+            with view_file.open("wb") as f:
+                views.write(f, encoding="UTF-8", xml_declaration=True, pretty_print=True)
 
     else:
-        with view_file.open("w") as f:
-            f.write(
-                render(
-                    template_name="skel/module/views/model_views.xml.jinja",
-                    context={
-                        "module": module.name,
-                        "model": model,
-                        "form": form,
-                        "list": list,
-                        "search": search,
-                    },
-                )
-            )
+        _write_template_file(
+            view_file,
+            _TPL_VIEWS,
+            {
+                "module": module.name,
+                "model": model,
+                "form": form,
+                "list": list,
+                "search": search,
+            }
+        )
 
     rich.print(
         f"[bold green]The views in {view_file}, for model {model} have been scaffolded in module {module}. Happy developing :)[/bold green]"